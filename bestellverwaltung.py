@@ -2,51 +2,274 @@ import sqlite3
 import datetime
 import sys
 import os
-import shutil
 import logging
+import logging.handlers
+import atexit
+import functools
+from collections import defaultdict
+
+# Preisbereinigung liegt als eigenständiges Skript im Projektordner (optional)
+try:
+    from clean_prices import clean_prices
+except ImportError:
+    clean_prices = None
 
 DB_NAME = 'bestellverwaltung.db'
 
-# Logging konfigurieren
+# Indizes auf Fremdschlüsselspalten (JOIN/WHERE in Rechnung, Produktliste, Triggern,
+# Mindestbestand), auf den Suchspalten (NOCASE, damit LIKE 'abc%' den Index nutzt)
+# und für den Bestellverlauf (Filter auf Kunde, sortiert nach Datum)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_bp_bestellid ON Bestellpositionen(BestellID);
+CREATE INDEX IF NOT EXISTS idx_bp_produktid ON Bestellpositionen(ProduktID);
+CREATE INDEX IF NOT EXISTS idx_lager_produktid ON Lagerbestand(ProduktID);
+CREATE INDEX IF NOT EXISTS idx_lager_lieferantid ON Lagerbestand(LieferantID);
+CREATE INDEX IF NOT EXISTS idx_bestellungen_kunde_datum ON Bestellungen(KundeID, Bestelldatum DESC);
+CREATE INDEX IF NOT EXISTS idx_kunden_name ON Kunden(Name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_produkte_name ON Produkte(Produktname COLLATE NOCASE);
+"""
+
+# Volltextindex (FTS5) für die Namenssuche. Die Tabellen speichern keinen eigenen
+# Inhalt (content=...), sondern nur den invertierten Index; Trigger halten ihn aktuell.
+# Stand von Schema-Version 4 (gilt auch für neue Datenbanken). Änderungen brauchen
+# eine neue Migration, da der v4-Schritt dieses Skript verwendet.
+FTS_V4 = """
+CREATE VIRTUAL TABLE IF NOT EXISTS Kunden_fts USING fts5(Name, content='Kunden', content_rowid='KundeID');
+CREATE VIRTUAL TABLE IF NOT EXISTS Produkte_fts USING fts5(Produktname, content='Produkte', content_rowid='ProduktID');
+
+CREATE TRIGGER IF NOT EXISTS kunden_fts_ai AFTER INSERT ON Kunden BEGIN
+    INSERT INTO Kunden_fts(rowid, Name) VALUES (new.KundeID, new.Name);
+END;
+CREATE TRIGGER IF NOT EXISTS kunden_fts_ad AFTER DELETE ON Kunden BEGIN
+    INSERT INTO Kunden_fts(Kunden_fts, rowid, Name) VALUES ('delete', old.KundeID, old.Name);
+END;
+CREATE TRIGGER IF NOT EXISTS kunden_fts_au AFTER UPDATE OF Name ON Kunden BEGIN
+    INSERT INTO Kunden_fts(Kunden_fts, rowid, Name) VALUES ('delete', old.KundeID, old.Name);
+    INSERT INTO Kunden_fts(rowid, Name) VALUES (new.KundeID, new.Name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS produkte_fts_ai AFTER INSERT ON Produkte BEGIN
+    INSERT INTO Produkte_fts(rowid, Produktname) VALUES (new.ProduktID, new.Produktname);
+END;
+CREATE TRIGGER IF NOT EXISTS produkte_fts_ad AFTER DELETE ON Produkte BEGIN
+    INSERT INTO Produkte_fts(Produkte_fts, rowid, Produktname) VALUES ('delete', old.ProduktID, old.Produktname);
+END;
+CREATE TRIGGER IF NOT EXISTS produkte_fts_au AFTER UPDATE OF Produktname ON Produkte BEGIN
+    INSERT INTO Produkte_fts(Produkte_fts, rowid, Produktname) VALUES ('delete', old.ProduktID, old.Produktname);
+    INSERT INTO Produkte_fts(rowid, Produktname) VALUES (new.ProduktID, new.Produktname);
+END;
+"""
+
+# Schema-Version (PRAGMA user_version); ältere Datenbanken werden in init_db migriert
+SCHEMA_VERSION = 4
+
+# Migrationsschritte mit festem SQL: jeder Schritt beschreibt genau seine Version,
+# unabhängig davon, wie INDEXES für neue Datenbanken später aussieht
+MIGRATIONS_V1_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_bp_bestellid ON Bestellpositionen(BestellID);
+CREATE INDEX IF NOT EXISTS idx_bp_produktid ON Bestellpositionen(ProduktID);
+CREATE INDEX IF NOT EXISTS idx_lager_produktid ON Lagerbestand(ProduktID);
+CREATE INDEX IF NOT EXISTS idx_bestell_kundeid ON Bestellungen(KundeID);
+"""
+
+MIGRATIONS_V1 = [
+    "ALTER TABLE Bestellungen ADD COLUMN Status TEXT DEFAULT 'offen'",
+    "ALTER TABLE Bestellungen ADD COLUMN Rabatt REAL DEFAULT 0.0",
+    "ALTER TABLE Bestellungen ADD COLUMN Mwst_Satz REAL DEFAULT 19.0",
+]
+
+# Neue Such-/Verlaufsindizes; idx_bestell_kundeid ist durch den zusammengesetzten
+# Index (KundeID, Bestelldatum) abgedeckt
+MIGRATIONS_V3 = """
+CREATE INDEX IF NOT EXISTS idx_lager_lieferantid ON Lagerbestand(LieferantID);
+CREATE INDEX IF NOT EXISTS idx_bestellungen_kunde_datum ON Bestellungen(KundeID, Bestelldatum DESC);
+CREATE INDEX IF NOT EXISTS idx_kunden_name ON Kunden(Name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_produkte_name ON Produkte(Produktname COLLATE NOCASE);
+DROP INDEX IF EXISTS idx_bestell_kundeid;
+"""
+
+# Häufig wiederholte Einzelabfragen (bleiben im Statement-Cache der Verbindung)
+SQL_KUNDE_NAME = "SELECT Name FROM Kunden WHERE KundeID = ?"
+SQL_PRODUKT_BESTAND = """
+    SELECT P.Produktname, P.Preis, COALESCE(L.Menge, 0)
+    FROM Produkte P
+    LEFT JOIN Lagerbestand L ON L.ProduktID = P.ProduktID
+    WHERE P.ProduktID = ?
+"""
+
+# Such- und Berichtsabfragen: fester SQL-Text, Benutzereingaben nur als Parameter,
+# damit der Statement-Cache bei jedem weiteren Aufruf trifft
+SQL_KUNDE_SUCHE_EXAKT = "SELECT KundeID, Name, Adresse FROM Kunden WHERE Name = ? COLLATE NOCASE"
+SQL_KUNDE_SUCHE_LIKE = "SELECT KundeID, Name, Adresse FROM Kunden WHERE Name LIKE ?"
+SQL_KUNDE_SUCHE_FTS = """
+    SELECT KundeID, Name, Adresse FROM Kunden
+    WHERE KundeID IN (SELECT rowid FROM Kunden_fts WHERE Kunden_fts MATCH ?)
+"""
+_SQL_PRODUKT_SUCHE = """
+    SELECT P.ProduktID, P.Produktname, P.Preis, COALESCE(L.Menge, 0) as Bestand
+    FROM Produkte P
+    LEFT JOIN Lagerbestand L ON P.ProduktID = L.ProduktID
+"""
+SQL_PRODUKT_SUCHE_EXAKT = _SQL_PRODUKT_SUCHE + "WHERE P.Produktname = ? COLLATE NOCASE"
+SQL_PRODUKT_SUCHE_LIKE = _SQL_PRODUKT_SUCHE + "WHERE P.Produktname LIKE ?"
+SQL_PRODUKT_SUCHE_FTS = (_SQL_PRODUKT_SUCHE + "WHERE P.ProduktID IN "
+                         "(SELECT rowid FROM Produkte_fts WHERE Produkte_fts MATCH ?)")
+SQL_BESTELLVERLAUF = """
+    SELECT B.BestellID, B.Bestelldatum, B.Status,
+           printf('%.2f', COALESCE(SUM(BP.Menge * P.Preis), 0)) AS Summe
+    FROM Bestellungen B
+    LEFT JOIN Bestellpositionen BP ON BP.BestellID = B.BestellID
+    LEFT JOIN Produkte P ON P.ProduktID = BP.ProduktID
+    WHERE B.KundeID = ?
+    GROUP BY B.BestellID
+    ORDER BY B.Bestelldatum DESC
+"""
+SQL_BESTELLDETAILS = """
+    SELECT BP.PositionID, P.Produktname, BP.Menge, P.Preis
+    FROM Bestellpositionen BP
+    JOIN Produkte P ON BP.ProduktID = P.ProduktID
+    WHERE BP.BestellID = ?
+"""
+# Nachbestellmenge: auf das Dreifache des Mindestbestands auffüllen
+SQL_MINDESTBESTAND = """
+    SELECT P.ProduktID, P.Produktname, L.Menge, L.Mindestbestand,
+           Li.Name as Lieferant, Li.Lieferzeit,
+           (L.Mindestbestand * 3 - L.Menge) AS Diff
+    FROM Lagerbestand L
+    JOIN Produkte P ON L.ProduktID = P.ProduktID
+    JOIN Lieferanten Li ON L.LieferantID = Li.LieferantID
+    WHERE L.Menge <= L.Mindestbestand
+    ORDER BY Diff DESC
+"""
+
+# Geteilte Verbindung für die gesamte Laufzeit (CLI ist single-threaded)
+_CONN = None
+# Zusätzliche Nur-Lese-Verbindung für Anzeigen und Berichte (siehe get_ro_conn)
+_RO_CONN = None
+
+# Ergebnis der Mindestbestand-Prüfung als (Datenversion, Zeilen), siehe _daten_version()
+_MINDESTBESTAND_CACHE = None
+
+# Logging konfigurieren: Einträge werden gepuffert und gesammelt in die Datei
+# geschrieben (bei vollem Puffer, ab ERROR sofort und beim Programmende)
+_log_file_handler = logging.FileHandler('bestellverwaltung.log')
+_log_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logging.basicConfig(
-    filename='bestellverwaltung.log',
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    handlers=[logging.handlers.MemoryHandler(100, flushLevel=logging.ERROR, target=_log_file_handler)]
 )
 
-# sqlite3 date adapter/converter registrieren (vermeidet DeprecationWarning ab Py3.12)
+# sqlite3 date adapter registrieren (vermeidet DeprecationWarning ab Py3.12).
+# Gelesen wird das Datum als ISO-String, ein Converter ist daher nicht nötig.
 def _adapt_date(d: datetime.date) -> str:
     return d.isoformat()
 
-def _convert_date(s: bytes) -> datetime.date:
-    return datetime.date.fromisoformat(s.decode())
-
 sqlite3.register_adapter(datetime.date, _adapt_date)
-sqlite3.register_converter("DATE", _convert_date)
 
-def connect_db():
+def _apply_pragmas(conn):
+    """Setzt die Verbindungs-PRAGMAs (WAL, synchronous=NORMAL, Cache, Fremdschlüssel)."""
+    # Wirkt nur bei einer noch leeren Datei und muss vor dem Wechsel auf WAL stehen
+    conn.execute("PRAGMA page_size=8192")
+    if DB_NAME != ':memory:':
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA foreign_keys=ON")
+    try:
+        # Lesezugriffe direkt aus der gemappten Datei (256 MiB)
+        conn.execute("PRAGMA mmap_size=268435456")
+    except sqlite3.Error as e:
+        logging.warning("mmap nicht verfügbar: %s", e)
+
+def get_conn():
+    """Liefert die prozessweit geteilte Verbindung (wird beim ersten Aufruf geöffnet)."""
+    global _CONN
+    if _CONN is not None:
+        return _CONN
     try:
-        conn = sqlite3.connect(DB_NAME, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        conn.row_factory = sqlite3.Row
-        return conn
+        _CONN = sqlite3.connect(DB_NAME, check_same_thread=False, cached_statements=256)
+        _CONN.row_factory = sqlite3.Row
+        # Kein implizites BEGIN: Transaktionen werden explizit geöffnet
+        _CONN.isolation_level = None
+        _apply_pragmas(_CONN)
+        return _CONN
     except sqlite3.Error as e:
-        logging.error(f"Datenbankverbindung fehlgeschlagen: {e}")
+        logging.error("Datenbankverbindung fehlgeschlagen: %s", e)
         print(f"Fehler: Datenbank konnte nicht geöffnet werden: {e}")
         sys.exit(1)
 
+def get_ro_conn():
+    """Liefert die geteilte Nur-Lese-Verbindung für reine Abfragen.
+
+    Im WAL-Modus liest sie einen konsistenten Stand, ohne auf die Schreib-
+    verbindung zu warten. Bei einer In-Memory-DB gibt es keine zweite
+    Verbindung auf dieselbe Datenbank, dann wird get_conn() verwendet.
+    """
+    global _RO_CONN
+    if DB_NAME == ':memory:':
+        return get_conn()
+    if _RO_CONN is not None:
+        return _RO_CONN
+    try:
+        _RO_CONN = sqlite3.connect(f"file:{DB_NAME}?mode=ro", uri=True,
+                                   check_same_thread=False, cached_statements=256)
+        _RO_CONN.row_factory = sqlite3.Row
+        _RO_CONN.isolation_level = None
+        _RO_CONN.execute("PRAGMA query_only=TRUE")
+        _RO_CONN.execute("PRAGMA temp_store=MEMORY")
+        _RO_CONN.execute("PRAGMA cache_size=-20000")
+        try:
+            _RO_CONN.execute("PRAGMA mmap_size=268435456")
+        except sqlite3.Error as e:
+            logging.warning("mmap nicht verfügbar: %s", e)
+        return _RO_CONN
+    except sqlite3.Error as e:
+        logging.error("Nur-Lese-Verbindung fehlgeschlagen: %s", e)
+        print(f"Fehler: Datenbank konnte nicht geöffnet werden: {e}")
+        sys.exit(1)
+
+def _close_db():
+    global _CONN, _RO_CONN
+    # Leseverbindung zuerst schließen, damit die Schreibverbindung als letzte
+    # den abschließenden WAL-Checkpoint ausführt
+    if _RO_CONN is not None:
+        _RO_CONN.close()
+        _RO_CONN = None
+    if _CONN is not None:
+        _CONN.close()
+        _CONN = None
+
+atexit.register(_close_db)
+
+def datenbank_checkpoint():
+    """Überträgt das WAL vollständig in die DB-Datei und kürzt es auf 0 Bytes."""
+    conn = get_conn()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
 def datenbank_sichern():
     print("\n--- Datenbank-Sicherung ---")
     try:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_name = f"bestellverwaltung_BACKUP_{timestamp}.db"
-        shutil.copy2(DB_NAME, backup_name)
-        logging.info(f"Datenbankbackup erstellt: {backup_name}")
+        if not os.path.exists(DB_NAME):
+            raise FileNotFoundError(DB_NAME)
+        # Online-Backup über die SQLite-API: konsistenter Schnappschuss inkl. WAL-Inhalt
+        src = get_conn()
+        datenbank_checkpoint()
+        dst = sqlite3.connect(backup_name)
+        try:
+            src.backup(dst, pages=1000)
+        finally:
+            dst.close()
+        logging.info("Datenbankbackup erstellt: %s", backup_name)
         print(f"Sicherung erfolgreich erstellt: {backup_name}")
     except FileNotFoundError:
         logging.error("Datenbank-Datei nicht gefunden")
         print("Fehler: Datenbankdatei nicht gefunden")
     except Exception as e:
-        logging.error(f"Fehler bei der Sicherung: {e}")
+        logging.error("Fehler bei der Sicherung: %s", e)
         print(f"Fehler bei der Sicherung: {e}")
 
 def init_db():
@@ -54,45 +277,53 @@ def init_db():
     if os.path.exists(DB_NAME):
         print(f"Datenbank '{DB_NAME}' existiert bereits. Prüfe Schema auf Migrationen...")
         # Verbindungsaufbau und automatische Migration fehlender Spalten
-        conn = connect_db()
+        conn = get_conn()
         c = conn.cursor()
         try:
-            c.execute("PRAGMA table_info(Bestellungen)")
-            cols = [r[1] for r in c.fetchall()]
-
-            # Gewünschte Spalten und ihre ALTER-Befehle
-            migrations = []
-            if 'Status' not in cols:
-                migrations.append("ALTER TABLE Bestellungen ADD COLUMN Status TEXT DEFAULT 'offen'")
-            if 'Rabatt' not in cols:
-                migrations.append("ALTER TABLE Bestellungen ADD COLUMN Rabatt REAL DEFAULT 0.0")
-            if 'Mwst_Satz' not in cols:
-                migrations.append("ALTER TABLE Bestellungen ADD COLUMN Mwst_Satz REAL DEFAULT 19.0")
-
-            for sql in migrations:
-                logging.info(f"Führe Migration aus: {sql}")
-                try:
-                    c.execute(sql)
-                except Exception as e:
-                    logging.error(f"Migration fehlgeschlagen: {e}")
-
-            # Stelle sicher, dass bestehende Reihen sinnvolle Defaults haben
-            if 'Status' in cols or any('Status' in s for s in migrations):
-                try:
+            version = c.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                with conn:
+                    # BEGIN im Skript, da executescript() offene Transaktionen committet
+                    c.executescript("BEGIN IMMEDIATE;" + MIGRATIONS_V1_INDEXES)
+                    for sql in MIGRATIONS_V1:
+                        logging.info("Führe Migration aus: %s", sql)
+                        try:
+                            c.execute(sql)
+                        except sqlite3.OperationalError as e:
+                            # Spalte existiert bereits (z.B. von init_db angelegt)
+                            if 'duplicate column' not in str(e):
+                                logging.error("Migration fehlgeschlagen: %s", e)
+
+                    # Stelle sicher, dass bestehende Reihen sinnvolle Defaults haben
                     c.execute("UPDATE Bestellungen SET Status = 'offen' WHERE Status IS NULL")
-                except Exception:
-                    pass
-
-            conn.commit()
+                    c.execute("PRAGMA user_version = 1")
+            if version < 2:
+                with conn:
+                    # Bestandsabzug bei neuen Positionen erfolgt gesammelt in neue_bestellung
+                    c.execute("BEGIN IMMEDIATE")
+                    logging.info("Führe Migration aus: DROP TRIGGER nach_bestellung_abziehen")
+                    c.execute("DROP TRIGGER IF EXISTS nach_bestellung_abziehen")
+                    c.execute("PRAGMA user_version = 2")
+            if version < 3:
+                with conn:
+                    logging.info("Führe Migration aus: Indizes für Suche und Bestellverlauf")
+                    c.executescript("BEGIN IMMEDIATE;" + MIGRATIONS_V3
+                                    + "PRAGMA user_version = 3;")
+            if version < 4:
+                with conn:
+                    # Volltextindex anlegen und aus den vorhandenen Daten aufbauen
+                    logging.info("Führe Migration aus: FTS5-Index für Kunden und Produkte")
+                    c.executescript("BEGIN IMMEDIATE;" + FTS_V4
+                                    + "INSERT INTO Kunden_fts(Kunden_fts) VALUES ('rebuild');"
+                                    + "INSERT INTO Produkte_fts(Produkte_fts) VALUES ('rebuild');"
+                                    + "PRAGMA user_version = 4;")
         except sqlite3.Error as e:
-            logging.error(f"Fehler bei Schema-Prüfung: {e}")
-        finally:
-            conn.close()
+            logging.error("Fehler bei Schema-Prüfung: %s", e)
         print("Schema-Prüfung abgeschlossen.")
         return
 
     print(f"Erstelle neue Datenbank '{DB_NAME}' mit korrigierten Daten...")
-    conn = connect_db()
+    conn = get_conn()
     c = conn.cursor()
 
     # Tabellen erstellen (Schema aus deiner SQL-Datei)
@@ -145,19 +376,10 @@ def init_db():
         FOREIGN KEY (LieferantID) REFERENCES Lieferanten(LieferantID)
     );
     """
-    c.executescript(schema)
 
     # Trigger separat erstellen
+    # (Abzug bei neuen Positionen erfolgt gesammelt in neue_bestellung)
     triggers = """
-    CREATE TRIGGER IF NOT EXISTS nach_bestellung_abziehen
-    AFTER INSERT ON Bestellpositionen
-    FOR EACH ROW
-    BEGIN
-        UPDATE Lagerbestand
-        SET Menge = Menge - NEW.Menge
-        WHERE ProduktID = NEW.ProduktID;
-    END;
-
     CREATE TRIGGER IF NOT EXISTS nach_menge_aenderung_gutschreiben
     AFTER UPDATE OF Menge ON Bestellpositionen
     FOR EACH ROW
@@ -178,40 +400,94 @@ def init_db():
         WHERE ProduktID = NEW.ProduktID;
     END;
     """
-    c.executescript(triggers)
-
-    # Korrigierte Beispieldaten einfügen
-    # Kunden
-    c.execute("INSERT INTO Kunden (Name, Adresse) VALUES ('Max Mustermann', 'Musterstraße 1')")
-    c.execute("INSERT INTO Kunden (Name, Adresse) VALUES ('Anna Schmidt', 'Hauptstraße 10')")
-    c.execute("INSERT INTO Kunden (Name, Adresse) VALUES ('Lisa Müller', 'Beispielweg 42')")
-    
-    # Lieferanten
-    c.execute("INSERT INTO Lieferanten (Name, Kontakt, Lieferzeit) VALUES ('TechGroßhandel GmbH', 'max@techgross.de', 3)")
-    c.execute("INSERT INTO Lieferanten (Name, Kontakt, Lieferzeit) VALUES ('ElektroPartner AG', 'vertrieb@elektropartner.de', 5)")
 
+    # Korrigierte Beispieldaten (je Tabelle ein vorbereitetes Statement)
+    kunden = [
+        ('Max Mustermann', 'Musterstraße 1'),
+        ('Anna Schmidt', 'Hauptstraße 10'),
+        ('Lisa Müller', 'Beispielweg 42'),
+    ]
+    lieferanten = [
+        ('TechGroßhandel GmbH', 'max@techgross.de', 3),
+        ('ElektroPartner AG', 'vertrieb@elektropartner.de', 5),
+    ]
     # Produkte (IDs werden 1, 2, 3 sein)
-    c.execute("INSERT INTO Produkte (Produktname, Preis) VALUES ('Laptop', 999.99)")
-    c.execute("INSERT INTO Produkte (Produktname, Preis) VALUES ('Smartphone', 699.99)")
-    c.execute("INSERT INTO Produkte (Produktname, Preis) VALUES ('Kopfhörer', 149.99)")
-
+    produkte = [
+        ('Laptop', 999.99),
+        ('Smartphone', 699.99),
+        ('Kopfhörer', 149.99),
+    ]
     # Lagerbestand (Bezug auf Produkt-IDs 1, 2, 3)
-    c.execute("INSERT INTO Lagerbestand (ProduktID, Menge, LieferantID, Mindestbestand) VALUES (1, 10, 1, 3)")
-    c.execute("INSERT INTO Lagerbestand (ProduktID, Menge, LieferantID, Mindestbestand) VALUES (2, 15, 2, 5)")
-    c.execute("INSERT INTO Lagerbestand (ProduktID, Menge, LieferantID, Mindestbestand) VALUES (3, 20, 1, 10)")
-
-    # Bestellungen
-    c.execute("INSERT INTO Bestellungen (KundeID, Bestelldatum) VALUES (1, '2025-12-01')") # ID 1
-    
+    lager = [
+        (1, 10, 1, 3),
+        (2, 15, 2, 5),
+        (3, 20, 1, 10),
+    ]
     # Bestellpositionen (Bezug auf Bestellung 1 und Produkte 1, 3)
-    c.execute("INSERT INTO Bestellpositionen (BestellID, ProduktID, Menge) VALUES (1, 1, 1)")
-    c.execute("INSERT INTO Bestellpositionen (BestellID, ProduktID, Menge) VALUES (1, 3, 2)")
+    positionen = [
+        (1, 1, 1),
+        (1, 3, 2),
+    ]
+
+    # Schema, Trigger und Beispieldaten atomar anlegen. executescript() committet
+    # vorher offene Transaktionen, daher wird BEGIN im Skript selbst abgesetzt.
+    with conn:
+        c.executescript("BEGIN;" + schema + INDEXES + FTS_V4 + triggers
+                        + f"PRAGMA user_version = {SCHEMA_VERSION};")
+        c.executemany("INSERT INTO Kunden (Name, Adresse) VALUES (?, ?)", kunden)
+        c.executemany("INSERT INTO Lieferanten (Name, Kontakt, Lieferzeit) VALUES (?, ?, ?)", lieferanten)
+        c.executemany("INSERT INTO Produkte (Produktname, Preis) VALUES (?, ?)", produkte)
+        c.executemany("INSERT INTO Lagerbestand (ProduktID, Menge, LieferantID, Mindestbestand) VALUES (?, ?, ?, ?)", lager)
+        c.execute("INSERT INTO Bestellungen (KundeID, Bestelldatum) VALUES (?, ?)", (1, '2025-12-01')) # ID 1
+        c.executemany("INSERT INTO Bestellpositionen (BestellID, ProduktID, Menge) VALUES (?, ?, ?)", positionen)
+        c.executemany("UPDATE Lagerbestand SET Menge = Menge - ? WHERE ProduktID = ?",
+                      [(menge, prod_id) for _, prod_id, menge in positionen])
 
-    conn.commit()
-    conn.close()
     print("Datenbank erfolgreich initialisiert.")
     logging.info("Neue Datenbank initialisiert")
 
+def _read_number(prompt, typ=int, min_val=0, max_val=None, default=None, bezeichnung="Wert", leer=None):
+    """Liest eine Zahl ein (Komma als Dezimaltrenner erlaubt) und prüft die Grenzen.
+
+    Leere Eingabe liefert `leer` (ersatzweise `default`), nicht lesbare Eingabe
+    liefert `default` mit Fehlermeldung. Liegt der Wert außerhalb der Grenzen,
+    wird immer eine Fehlermeldung ausgegeben und None zurückgegeben, damit der
+    Aufrufer abbrechen oder selbst einen Ersatzwert setzen kann.
+    """
+    eingabe = input(prompt).strip().replace(',', '.')
+    if not eingabe:
+        if leer is not None:
+            return leer
+        if default is not None:
+            return default
+    try:
+        wert = typ(eingabe)
+    except ValueError:
+        hinweis = f" Setze auf {default:g}." if isinstance(default, (int, float)) else ""
+        print(f"Fehler: Ungültige Eingabe für {bezeichnung}.{hinweis}")
+        return default
+    if max_val is not None and (wert > max_val or (min_val is not None and wert < min_val)):
+        if min_val is None:
+            print(f"Fehler: {bezeichnung} darf höchstens {max_val} sein.")
+        else:
+            print(f"Fehler: {bezeichnung} muss zwischen {min_val} und {max_val} liegen.")
+        return None
+    if min_val is not None and wert < min_val:
+        if min_val == 0:
+            print(f"Fehler: {bezeichnung} kann nicht negativ sein.")
+        else:
+            print(f"Fehler: {bezeichnung} muss mindestens {min_val} sein.")
+        return None
+    return wert
+
+@functools.lru_cache(maxsize=64)
+def _zeilen_formatierer(widths):
+    """Erzeugt eine Zeilen-Formatierfunktion mit fest eingesetzten Spaltenbreiten."""
+    felder = " | ".join(f"{{r[{i}]!s:<{w}}}" for i, w in enumerate(widths))
+    namespace = {}
+    exec(f"def _p(r): return f'{felder}'", namespace)
+    return namespace["_p"]
+
 def print_table(headers, rows):
     """Hilfsfunktion für schöne Tabellenausgabe"""
     if not rows:
@@ -219,45 +495,63 @@ def print_table(headers, rows):
         return
     
     # Spaltenbreiten berechnen
-    widths = [len(h) for h in headers]
-    for row in rows:
-        for i, val in enumerate(row):
-            widths[i] = max(widths[i], len(str(val)))
+    widths = [max(len(h), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
             
-    # Formatstring erstellen
-    fmt = " | ".join([f"{{:<{w}}}" for w in widths])
+    # Formatierfunktion und Trennlinie einmalig erstellen
+    fmt = _zeilen_formatierer(tuple(widths))
+    sep = "-" * (sum(widths) + 3 * (len(headers) - 1))
     
-    print("-" * (sum(widths) + 3 * (len(headers) - 1)))
-    print(fmt.format(*headers))
-    print("-" * (sum(widths) + 3 * (len(headers) - 1)))
-    for row in rows:
-        print(fmt.format(*[str(v) for v in row]))
-    print("-" * (sum(widths) + 3 * (len(headers) - 1)))
+    # Gesamte Tabelle mit einem write() ausgeben
+    lines = [sep, fmt(headers), sep]
+    lines.extend(fmt(row) for row in rows)
+    lines.append(sep)
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+def _daten_version():
+    """Liefert einen Zähler, der sich bei jeder geschriebenen Änderung ändert.
+
+    PRAGMA data_version der Leseverbindung ändert sich bei jedem Commit einer
+    anderen Verbindung, also auch der Schreibverbindung dieses Prozesses oder
+    eines anderen Programms (z.B. clean_prices.py). Bei einer In-Memory-DB gibt
+    es nur eine Verbindung, dort dient total_changes als Zähler.
+    """
+    conn = get_ro_conn()
+    if conn is _CONN:
+        return conn.total_changes
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+# Listenabfragen werden zwischengespeichert, da das Menü nach jeder Aktion
+# typischerweise erneut eine Liste anzeigt. Schlüssel ist _daten_version(),
+# sodass jede Änderung (auch aus anderen Prozessen) den Cache verwirft.
+@functools.lru_cache(maxsize=1)
+def _kunden_zeilen(_version):
+    return get_ro_conn().execute("SELECT KundeID, Name, Adresse FROM Kunden").fetchall()
+
+@functools.lru_cache(maxsize=1)
+def _produkt_zeilen(_version):
+    return get_ro_conn().execute("SELECT P.ProduktID, P.Produktname, P.Preis, COALESCE(L.Menge, 0) as Menge FROM Produkte P LEFT JOIN Lagerbestand L ON P.ProduktID = L.ProduktID").fetchall()
+
+@functools.lru_cache(maxsize=1)
+def _lieferanten_zeilen(_version):
+    return get_ro_conn().execute("SELECT LieferantID, Name, Kontakt, Lieferzeit FROM Lieferanten").fetchall()
 
 def list_kunden():
     try:
-        conn = connect_db()
-        c = conn.cursor()
-        c.execute("SELECT KundeID, Name, Adresse FROM Kunden")
-        rows = c.fetchall()
-        conn.close()
+        rows = _kunden_zeilen(_daten_version())
         print("\n--- Kundenliste ---")
         print_table(["ID", "Name", "Adresse"], rows)
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Abrufen der Kundenliste: {e}")
+        logging.error("Fehler beim Abrufen der Kundenliste: %s", e)
         print(f"Fehler beim Abrufen der Kunden: {e}")
 
 def list_produkte():
     try:
-        conn = connect_db()
-        c = conn.cursor()
-        c.execute("SELECT P.ProduktID, P.Produktname, P.Preis, COALESCE(L.Menge, 0) as Menge FROM Produkte P LEFT JOIN Lagerbestand L ON P.ProduktID = L.ProduktID")
-        rows = c.fetchall()
-        conn.close()
+        rows = _produkt_zeilen(_daten_version())
         print("\n--- Produktliste & Bestand ---")
         print_table(["ID", "Name", "Preis", "Lagerbestand"], rows)
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Abrufen der Produktliste: {e}")
+        logging.error("Fehler beim Abrufen der Produktliste: %s", e)
         print(f"Fehler beim Abrufen der Produkte: {e}")
 
 def neuer_kunde():
@@ -273,96 +567,100 @@ def neuer_kunde():
             print("Fehler: Adresse darf nicht leer sein.")
             return
         
-        conn = connect_db()
-        c = conn.cursor()
-        c.execute("INSERT INTO Kunden (Name, Adresse) VALUES (?, ?)", (name, adresse))
-        conn.commit()
-        kunde_id = c.lastrowid
-        logging.info(f"Neuer Kunde hinzugefügt: {name} (ID: {kunde_id})")
+        conn = get_conn()
+        cur = conn.execute("INSERT INTO Kunden (Name, Adresse) VALUES (?, ?)", (name, adresse))
+        kunde_id = cur.lastrowid
+        logging.info("Neuer Kunde hinzugefügt: %s (ID: %s)", name, kunde_id)
         print(f"Kunde '{name}' hinzugefügt (ID: {kunde_id}).")
-        conn.close()
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Hinzufügen des Kunden: {e}")
+        logging.error("Fehler beim Hinzufügen des Kunden: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Unerwarteter Fehler: {e}")
+        logging.error("Unerwarteter Fehler: %s", e)
         print(f"Fehler: {e}")
 
+# Rückgabe von _read_number für leere bzw. nicht lesbare Eingaben, wenn der
+# Aufrufer den Fall selbst behandelt (kein Zahlenwert, daher ohne "Setze auf")
+_KEINE_ZAHL = object()
+
 def neues_produkt():
     print("\n--- Neues Produkt ---")
+    conn = get_conn()
     try:
         name = input("Produktname: ").strip()
         if not name:
             print("Fehler: Produktname darf nicht leer sein.")
             return
         
-        preis_input = input("Preis: ").replace(',', '.').strip()
-        try:
-            preis = float(preis_input)
-            if preis < 0:
-                print("Fehler: Preis kann nicht negativ sein.")
-                return
-        except ValueError:
-            print("Fehler: Ungültiger Preis. Bitte eine Dezimalzahl eingeben.")
+        preis = _read_number("Preis: ", float, bezeichnung="Preis")
+        if preis is None:
             return
         
-        conn = connect_db()
         c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
         c.execute("INSERT INTO Produkte (Produktname, Preis) VALUES (?, ?)", (name, preis))
         prod_id = c.lastrowid
         
         # Initialen Lagerbestand anlegen
         print("Initialer Lagerbestand:")
         try:
-            menge = int(input("Menge: ").strip())
-            if menge < 0:
-                print("Fehler: Menge kann nicht negativ sein.")
-                conn.close()
-                return
-            
-            min_bestand = int(input("Mindestbestand: ").strip())
-            if min_bestand < 0:
-                print("Fehler: Mindestbestand kann nicht negativ sein.")
-                conn.close()
-                return
-            
-            # Lieferant wählen
-            c.execute("SELECT LieferantID, Name FROM Lieferanten")
-            lieferanten = c.fetchall()
-            if not lieferanten:
-                print("Fehler: Kein Lieferant vorhanden. Bitte erst einen Lieferanten anlegen.")
-                conn.close()
+            menge = _read_number("Menge: ", default=_KEINE_ZAHL, bezeichnung="Menge")
+            if menge is None:
+                conn.rollback()
                 return
             
-            print_table(["ID", "Name"], lieferanten)
-            lief_id = int(input("Lieferant ID: ").strip())
-            
-            # Lieferant validieren
-            c.execute("SELECT LieferantID FROM Lieferanten WHERE LieferantID = ?", (lief_id,))
-            if not c.fetchone():
-                print("Fehler: Lieferant-ID nicht gefunden.")
-                conn.close()
-                return
+            min_bestand = _KEINE_ZAHL
+            if menge is not _KEINE_ZAHL:
+                min_bestand = _read_number("Mindestbestand: ", default=_KEINE_ZAHL, bezeichnung="Mindestbestand")
+                if min_bestand is None:
+                    conn.rollback()
+                    return
             
-            c.execute("INSERT INTO Lagerbestand (ProduktID, Menge, LieferantID, Mindestbestand) VALUES (?, ?, ?, ?)",
-                      (prod_id, menge, lief_id, min_bestand))
+            if min_bestand is _KEINE_ZAHL:
+                # Ohne Menge/Mindestbestand wird das Produkt ohne Lagerbestand angelegt
+                print("Produkt wird ohne Lagerbestand angelegt.")
+                logging.warning("Produkt %s ohne Lagerbestand angelegt", name)
+            else:
+                # Lieferant wählen
+                c.execute("SELECT LieferantID, Name FROM Lieferanten")
+                lieferanten = c.fetchall()
+                if not lieferanten:
+                    print("Fehler: Kein Lieferant vorhanden. Bitte erst einen Lieferanten anlegen.")
+                    conn.rollback()
+                    return
+                
+                print_table(["ID", "Name"], lieferanten)
+                lief_id = int(input("Lieferant ID: ").strip())
+                
+                # Lieferant wird über den Fremdschlüssel validiert
+                try:
+                    c.execute("INSERT INTO Lagerbestand (ProduktID, Menge, LieferantID, Mindestbestand) VALUES (?, ?, ?, ?)",
+                              (prod_id, menge, lief_id, min_bestand))
+                except sqlite3.IntegrityError:
+                    print("Fehler: Lieferant-ID nicht gefunden.")
+                    conn.rollback()
+                    return
         except ValueError:
             print("Fehler bei der Eingabe, Produkt wurde ohne Lagerbestand angelegt.")
-            logging.warning(f"Produkt {name} ohne Lagerbestand angelegt")
+            logging.warning("Produkt %s ohne Lagerbestand angelegt", name)
             
         conn.commit()
-        logging.info(f"Neues Produkt hinzugefügt: {name} (ID: {prod_id})")
+        logging.info("Neues Produkt hinzugefügt: %s (ID: %s)", name, prod_id)
         print(f"Produkt '{name}' hinzugefügt.")
-        conn.close()
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Hinzufügen des Produkts: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        logging.error("Fehler beim Hinzufügen des Produkts: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Unerwarteter Fehler: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        logging.error("Unerwarteter Fehler: %s", e)
         print(f"Fehler: {e}")
 
 def neue_bestellung():
     print("\n--- Neue Bestellung aufgeben ---")
+    conn = get_conn()
     try:
         # 1. Kunde auswählen
         list_kunden()
@@ -373,26 +671,39 @@ def neue_bestellung():
             return
 
         # Bestellung anlegen
-        conn = connect_db()
         c = conn.cursor()
-        
-        # Prüfen ob Kunde existiert
-        c.execute("SELECT Name FROM Kunden WHERE KundeID = ?", (kunde_id,))
-        kunde = c.fetchone()
+
+        # Bestellung samt Positionen in einer Transaktion (ein Commit statt einem pro Position)
+        c.execute("BEGIN IMMEDIATE")
+
+        # Kunde in der Datenbank prüfen (die angezeigte Liste kann zwischengespeichert sein)
+        kunde = c.execute(SQL_KUNDE_NAME, (kunde_id,)).fetchone()
         if not kunde:
             print("Fehler: Kunde nicht gefunden.")
-            conn.close()
+            conn.rollback()
             return
-
+        kunde_name = kunde[0]
         datum = datetime.date.today()
         c.execute("INSERT INTO Bestellungen (KundeID, Bestelldatum) VALUES (?, ?)", (kunde_id, datum))
         bestell_id = c.lastrowid
-        print(f"Bestellung {bestell_id} für {kunde[0]} am {datum} angelegt.")
-        logging.info(f"Neue Bestellung erstellt: ID {bestell_id} für Kunde {kunde[0]}")
+        # Bestandsabzug je Produkt sammeln und vor dem Commit in einem Schritt buchen
+        bestand_abzug = defaultdict(int)
+        print(f"Bestellung {bestell_id} für {kunde_name} am {datum} angelegt.")
+        logging.info("Neue Bestellung erstellt: ID %s für Kunde %s", bestell_id, kunde_name)
+
+        # Produkte und Bestand einmalig laden: ProduktID -> [Name, Preis, Bestand]
+        c.execute("""
+            SELECT P.ProduktID, P.Produktname, P.Preis, COALESCE(L.Menge, 0)
+            FROM Produkte P
+            LEFT JOIN Lagerbestand L ON P.ProduktID = L.ProduktID
+        """)
+        produkte = {r[0]: [r[1], r[2], r[3]] for r in c.fetchall()}
 
         # 2. Positionen hinzufügen (Loop)
         while True:
-            list_produkte()
+            print("\n--- Produktliste & Bestand ---")
+            print_table(["ID", "Name", "Preis", "Lagerbestand"],
+                        [(pid, *werte) for pid, werte in produkte.items()])
             try:
                 prod_id_input = input("Produkt ID eingeben (oder 'f' für fertig): ").strip()
                 if prod_id_input.lower() == 'f':
@@ -400,68 +711,56 @@ def neue_bestellung():
                 
                 prod_id = int(prod_id_input)
                 
-                # Preis und Name holen für Bestätigung
-                c.execute("SELECT Produktname FROM Produkte WHERE ProduktID = ?", (prod_id,))
-                prod = c.fetchone()
-                if not prod:
-                    print("Fehler: Produkt nicht gefunden.")
-                    continue
-                
-                # Verfügbaren Bestand prüfen
-                c.execute("SELECT Menge FROM Lagerbestand WHERE ProduktID = ?", (prod_id,))
-                bestand = c.fetchone()
-                verfuegbar = bestand[0] if bestand else 0
+                # Nur unbekannte IDs (z.B. zwischenzeitlich angelegt) nachladen
+                if prod_id not in produkte:
+                    c.execute(SQL_PRODUKT_BESTAND, (prod_id,))
+                    prod = c.fetchone()
+                    if not prod:
+                        print("Fehler: Produkt nicht gefunden.")
+                        continue
+                    produkte[prod_id] = list(prod)
+
+                produktname, _, verfuegbar = produkte[prod_id]
                 
-                menge_input = input(f"Menge für '{prod[0]}' (Verfügbar: {verfuegbar}): ").strip()
-                menge = int(menge_input)
-                
-                if menge <= 0:
-                    print("Fehler: Menge muss größer als 0 sein.")
+                menge = _read_number(f"Menge für '{produktname}' (Verfügbar: {verfuegbar}): ",
+                                     min_val=1, bezeichnung="Menge")
+                if menge is None:
                     continue
                 
                 # BESTANDS-PRÜFUNG
                 if menge > verfuegbar:
                     print(f"Fehler: Nicht genug Bestand! Verfügbar: {verfuegbar}, angefordert: {menge}")
-                    logging.warning(f"Bestellung abgelehnt: Nicht genug Bestand für Produkt {prod_id}")
+                    logging.warning("Bestellung abgelehnt: Nicht genug Bestand für Produkt %s", prod_id)
                     continue
                 
                 c.execute("INSERT INTO Bestellpositionen (BestellID, ProduktID, Menge) VALUES (?, ?, ?)", 
                           (bestell_id, prod_id, menge))
-                print(f"✓ {menge}x {prod[0]} zur Bestellung hinzugefügt.")
-                logging.info(f"Bestellposition hinzugefügt: {menge}x {prod[0]} zu Bestellung {bestell_id}")
+                bestand_abzug[prod_id] += menge
+                produkte[prod_id][2] -= menge
+                print(f"✓ {menge}x {produktname} zur Bestellung hinzugefügt.")
+                logging.info("Bestellposition hinzugefügt: %sx %s zu Bestellung %s", menge, produktname, bestell_id)
                 
             except ValueError:
                 print("Fehler: Ungültige Eingabe. Bitte eine Zahl eingeben.")
             except sqlite3.Error as e:
-                logging.error(f"Datenbankfehler: {e}")
+                logging.error("Datenbankfehler: %s", e)
                 print(f"Datenbankfehler: {e}")
 
+        c.executemany("UPDATE Lagerbestand SET Menge = Menge - ? WHERE ProduktID = ?",
+                      [(menge, prod_id) for prod_id, menge in bestand_abzug.items()])
+
         # 3. Rabatt eingeben
-        try:
-            rabatt_input = input("\nRabatt in % eingeben (Standard: 0): ").strip()
-            if rabatt_input:
-                rabatt = float(rabatt_input.replace(',', '.'))
-                if rabatt < 0 or rabatt > 100:
-                    print("Fehler: Rabatt muss zwischen 0 und 100% liegen. Setze auf 0.")
-                    rabatt = 0.0
-            else:
-                rabatt = 0.0
-        except ValueError:
-            print("Fehler: Ungültiger Rabatt. Setze auf 0.")
+        rabatt = _read_number("\nRabatt in % eingeben (Standard: 0): ", float,
+                              max_val=100, default=0.0, bezeichnung="Rabatt")
+        if rabatt is None:
+            print("Setze Rabatt auf 0.")
             rabatt = 0.0
         
         # 4. MwSt-Satz eingeben
-        try:
-            mwst_input = input("MwSt-Satz in % eingeben (Standard: 19): ").strip()
-            if mwst_input:
-                mwst = float(mwst_input.replace(',', '.'))
-                if mwst < 0 or mwst > 100:
-                    print("Fehler: MwSt muss zwischen 0 und 100% liegen. Setze auf 19.")
-                    mwst = 19.0
-            else:
-                mwst = 19.0
-        except ValueError:
-            print("Fehler: Ungültige MwSt. Setze auf 19.")
+        mwst = _read_number("MwSt-Satz in % eingeben (Standard: 19): ", float,
+                            max_val=100, default=19.0, bezeichnung="MwSt")
+        if mwst is None:
+            print("Setze MwSt auf 19.")
             mwst = 19.0
 
         # Rabatt und MwSt speichern
@@ -471,10 +770,11 @@ def neue_bestellung():
         conn.commit()
         print(f"✓ Bestellung {bestell_id} abgeschlossen.")
         print(f"  Rabatt: {rabatt:.2f}% | MwSt: {mwst:.2f}%")
-        logging.info(f"Bestellung {bestell_id} abgeschlossen - Rabatt: {rabatt}%, MwSt: {mwst}%")
-        conn.close()
+        logging.info("Bestellung %s abgeschlossen - Rabatt: %s%%, MwSt: %s%%", bestell_id, rabatt, mwst)
     except Exception as e:
-        logging.error(f"Fehler in neue_bestellung(): {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        logging.error("Fehler in neue_bestellung(): %s", e)
         print(f"Fehler: {e}")
 
 def zeige_rechnung():
@@ -486,24 +786,31 @@ def zeige_rechnung():
         return
 
     try:
-        conn = connect_db()
+        conn = get_ro_conn()
         c = conn.cursor()
 
-        # Bestelldaten und Kunde
+        # Bestelldaten, Kunde und Positionen in einer Abfrage: jede Zeile trägt die
+        # Kopfdaten, Positionsspalten sind NULL, wenn die Bestellung leer ist.
+        # Subtotal per Fensterfunktion über alle Positionen.
         c.execute("""
-            SELECT B.Bestelldatum, K.Name, K.Adresse, B.Status, B.Rabatt, B.Mwst_Satz
-            FROM Bestellungen B 
-            JOIN Kunden K ON B.KundeID = K.KundeID 
+            SELECT B.Bestelldatum, K.Name, K.Adresse, B.Status, B.Rabatt, B.Mwst_Satz,
+                   BP.PositionID, P.Produktname, P.Preis, BP.Menge,
+                   P.Preis * BP.Menge AS Zeilensumme,
+                   SUM(P.Preis * BP.Menge) OVER () AS Subtotal
+            FROM Bestellungen B
+            JOIN Kunden K ON B.KundeID = K.KundeID
+            LEFT JOIN Bestellpositionen BP ON BP.BestellID = B.BestellID
+            LEFT JOIN Produkte P ON P.ProduktID = BP.ProduktID
             WHERE B.BestellID = ?
+            ORDER BY BP.PositionID
         """, (bestell_id,))
-        bestellung = c.fetchone()
+        zeilen = c.fetchall()
 
-        if not bestellung:
+        if not zeilen:
             print("Fehler: Bestellung nicht gefunden.")
-            conn.close()
             return
 
-        datum, kunde_name, adresse, status, rabatt, mwst_satz = bestellung
+        datum, kunde_name, adresse, status, rabatt, mwst_satz = zeilen[0][:6]
 
         print("\n" + "="*60)
         print(f"RECHNUNG für Bestellung Nr. {bestell_id}")
@@ -514,30 +821,20 @@ def zeige_rechnung():
         print("="*60)
 
         # Positionen
-        c.execute("""
-            SELECT BP.PositionID, P.Produktname, P.Preis, BP.Menge
-            FROM Bestellpositionen BP
-            JOIN Produkte P ON BP.ProduktID = P.ProduktID
-            WHERE BP.BestellID = ?
-        """, (bestell_id,))
-        
-        positionen = c.fetchall()
+        positionen = [z[6:] for z in zeilen if z[6] is not None]
         
         if not positionen:
             print("Keine Positionen in dieser Bestellung.")
-            conn.close()
             return
         
         # Berechnung
-        subtotal = 0.0
+        subtotal = positionen[0][5]
         
         print(f"{'ID':<4} | {'Produkt':<20} | {'Menge':<5} | {'Einzel':<8} | {'Gesamt':<10}")
         print("-" * 65)
         
         for pos in positionen:
-            pos_id, name, preis, menge = pos
-            zeilen_summe = preis * menge
-            subtotal += zeilen_summe
+            pos_id, name, preis, menge, zeilen_summe, _ = pos
             print(f"{pos_id:<4} | {name:<20} | {menge:<5} | {preis:>8.2f} | {zeilen_summe:>10.2f}")
             
         print("-" * 65)
@@ -561,13 +858,12 @@ def zeige_rechnung():
         print(f"{'GESAMTSUMME:':<50} {gesamtsumme:>10.2f} €")
         print("="*60 + "\n")
         
-        logging.info(f"Rechnung angezeigt: Bestellung {bestell_id} - Summe: {gesamtsumme:.2f}€")
-        conn.close()
+        logging.info("Rechnung angezeigt: Bestellung %s - Summe: %.2f€", bestell_id, gesamtsumme)
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler beim Abrufen der Rechnung: {e}")
+        logging.error("Datenbankfehler beim Abrufen der Rechnung: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in zeige_rechnung(): {e}")
+        logging.error("Fehler in zeige_rechnung(): %s", e)
         print(f"Fehler: {e}")
 
 def lagerbestand_korrigieren():
@@ -580,56 +876,40 @@ def lagerbestand_korrigieren():
         return
 
     try:
-        conn = connect_db()
-        c = conn.cursor()
+        conn = get_conn()
 
         # Prüfen, ob Eintrag existiert
-        c.execute("SELECT P.Produktname, L.Menge FROM Produkte P JOIN Lagerbestand L ON P.ProduktID = L.ProduktID WHERE P.ProduktID = ?", (prod_id,))
-        result = c.fetchone()
+        result = conn.execute("SELECT P.Produktname, L.Menge FROM Produkte P JOIN Lagerbestand L ON P.ProduktID = L.ProduktID WHERE P.ProduktID = ?", (prod_id,)).fetchone()
 
         if not result:
             print("Fehler: Kein Lagerbestand für dieses Produkt gefunden.")
-            conn.close()
             return
 
         name, aktuelle_menge = result
         print(f"Produkt: {name}")
         print(f"Aktueller Bestand im System: {aktuelle_menge}")
 
-        try:
-            neue_menge = int(input("Neuer tatsächlicher Bestand: ").strip())
-            if neue_menge < 0:
-                print("Fehler: Bestand kann nicht negativ sein.")
-                conn.close()
-                return
-        except ValueError:
-            print("Fehler: Ungültige Eingabe.")
-            conn.close()
+        neue_menge = _read_number("Neuer tatsächlicher Bestand: ", bezeichnung="Bestand")
+        if neue_menge is None:
             return
 
-        c.execute("UPDATE Lagerbestand SET Menge = ? WHERE ProduktID = ?", (neue_menge, prod_id))
-        conn.commit()
-        logging.info(f"Lagerbestand korrigiert für Produkt {name}: {aktuelle_menge} → {neue_menge}")
+        conn.execute("UPDATE Lagerbestand SET Menge = ? WHERE ProduktID = ?", (neue_menge, prod_id))
+        logging.info("Lagerbestand korrigiert für Produkt %s: %s → %s", name, aktuelle_menge, neue_menge)
         print(f"✓ Bestand für '{name}' auf {neue_menge} korrigiert.")
-        conn.close()
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler beim Korrigieren des Lagerbestands: {e}")
+        logging.error("Datenbankfehler beim Korrigieren des Lagerbestands: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in lagerbestand_korrigieren(): {e}")
+        logging.error("Fehler in lagerbestand_korrigieren(): %s", e)
         print(f"Fehler: {e}")
 
 def list_lieferanten():
     try:
-        conn = connect_db()
-        c = conn.cursor()
-        c.execute("SELECT LieferantID, Name, Kontakt, Lieferzeit FROM Lieferanten")
-        rows = c.fetchall()
-        conn.close()
+        rows = _lieferanten_zeilen(_daten_version())
         print("\n--- Lieferantenliste ---")
         print_table(["ID", "Name", "Kontakt", "Lieferzeit (Tage)"], rows)
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Abrufen der Lieferantenliste: {e}")
+        logging.error("Fehler beim Abrufen der Lieferantenliste: %s", e)
         print(f"Fehler beim Abrufen der Lieferanten: {e}")
 
 def neuer_lieferant():
@@ -645,36 +925,31 @@ def neuer_lieferant():
             print("Fehler: Kontakt darf nicht leer sein.")
             return
         
-        try:
-            zeit = int(input("Lieferzeit in Tagen: ").strip())
-            if zeit < 0:
-                print("Fehler: Lieferzeit kann nicht negativ sein.")
-                return
-        except ValueError:
-            print("Fehler: Ungültige Lieferzeit, setze Standardwert 0.")
+        zeit = _read_number("Lieferzeit in Tagen: ", default=0, leer=_KEINE_ZAHL, bezeichnung="Lieferzeit")
+        if zeit is None:
+            return
+        if zeit is _KEINE_ZAHL:
+            print("Fehler: Keine Lieferzeit angegeben, setze Standardwert 0.")
             zeit = 0
         
-        conn = connect_db()
-        c = conn.cursor()
-        c.execute("INSERT INTO Lieferanten (Name, Kontakt, Lieferzeit) VALUES (?, ?, ?)", (name, kontakt, zeit))
-        conn.commit()
-        lieferant_id = c.lastrowid
-        logging.info(f"Neuer Lieferant hinzugefügt: {name} (ID: {lieferant_id})")
+        conn = get_conn()
+        cur = conn.execute("INSERT INTO Lieferanten (Name, Kontakt, Lieferzeit) VALUES (?, ?, ?)", (name, kontakt, zeit))
+        lieferant_id = cur.lastrowid
+        logging.info("Neuer Lieferant hinzugefügt: %s (ID: %s)", name, lieferant_id)
         print(f"Lieferant '{name}' hinzugefügt.")
-        conn.close()
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Hinzufügen des Lieferanten: {e}")
+        logging.error("Fehler beim Hinzufügen des Lieferanten: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Unerwarteter Fehler: {e}")
+        logging.error("Unerwarteter Fehler: %s", e)
         print(f"Fehler: {e}")
 
 def bestellposition_aendern():
     """Ändert die Menge einer Bestellposition oder löscht sie."""
     print("\n--- Bestellposition ändern/löschen ---")
+    conn = get_conn()
     try:
         bestell_id = int(input("Bestell-ID eingeben: ").strip())
-        conn = connect_db()
         c = conn.cursor()
         
         # Zeige alle Positionen der Bestellung
@@ -689,7 +964,6 @@ def bestellposition_aendern():
         positionen = c.fetchall()
         if not positionen:
             print("Keine Positionen für diese Bestellung gefunden.")
-            conn.close()
             return
         
         print("\n--- Positionen in Bestellung ---")
@@ -699,24 +973,24 @@ def bestellposition_aendern():
             pos_id = int(input("\nPosition ID zum Ändern eingeben: ").strip())
         except ValueError:
             print("Fehler: Ungültige Position ID.")
-            conn.close()
             return
         
-        # Prüfe, ob Position existiert
+        # Prüfe, ob Position existiert (inkl. aktuellem Lagerbestand)
         c.execute("""
-            SELECT BP.PositionID, BP.BestellID, BP.ProduktID, BP.Menge, P.Produktname
+            SELECT BP.PositionID, BP.BestellID, BP.ProduktID, BP.Menge, P.Produktname,
+                   COALESCE(L.Menge, 0) AS Bestand
             FROM Bestellpositionen BP
             JOIN Produkte P ON BP.ProduktID = P.ProduktID
+            LEFT JOIN Lagerbestand L ON L.ProduktID = P.ProduktID
             WHERE BP.PositionID = ?
         """, (pos_id,))
         
         position = c.fetchone()
         if not position:
             print("Fehler: Position nicht gefunden.")
-            conn.close()
             return
         
-        pos_id_val, bestell_id_val, prod_id, alte_menge, prod_name = position
+        pos_id_val, bestell_id_val, prod_id, alte_menge, prod_name, verfuegbar = position
         
         print(f"\nAktuelle Position: {prod_name}, Menge: {alte_menge}")
         print("Optionen:")
@@ -730,69 +1004,67 @@ def bestellposition_aendern():
                 neue_menge = int(input("Neue Menge eingeben: ").strip())
                 if neue_menge < 0:
                     print("Fehler: Menge kann nicht negativ sein.")
-                    conn.close()
                     return
                 
                 if neue_menge == 0:
                     print("Menge 0 bedeutet: Position wird gelöscht!")
                     bestaetigung = input("Bestätigen? (j/n): ").strip().lower()
                     if bestaetigung != 'j':
-                        conn.close()
                         return
+                    c.execute("BEGIN IMMEDIATE")
                     c.execute("DELETE FROM Bestellpositionen WHERE PositionID = ?", (pos_id,))
                     # Bestand zurückbuchen
                     c.execute("UPDATE Lagerbestand SET Menge = Menge + ? WHERE ProduktID = ?", 
                              (alte_menge, prod_id))
-                    logging.info(f"Bestellposition {pos_id} gelöscht. Bestand +{alte_menge}")
+                    logging.info("Bestellposition %s gelöscht. Bestand +%s", pos_id, alte_menge)
                     print(f"✓ Position gelöscht. Bestand von '{prod_name}' +{alte_menge}")
                 else:
                     # Bestandsprüfung bei Erhöhung
                     if neue_menge > alte_menge:
-                        c.execute("SELECT Menge FROM Lagerbestand WHERE ProduktID = ?", (prod_id,))
-                        bestand = c.fetchone()
-                        verfuegbar = bestand[0] if bestand else 0
                         menge_erhoehung = neue_menge - alte_menge
                         
                         if menge_erhoehung > verfuegbar:
                             print(f"Fehler: Nicht genug Bestand! Verfügbar: {verfuegbar}, angefordert: {menge_erhoehung}")
-                            conn.close()
                             return
                     
+                    # Einzelnes UPDATE, läuft ohne BEGIN im Autocommit
                     c.execute("UPDATE Bestellpositionen SET Menge = ? WHERE PositionID = ?", 
                              (neue_menge, pos_id))
-                    logging.info(f"Bestellposition {pos_id} geändert: {alte_menge} → {neue_menge}")
+                    logging.info("Bestellposition %s geändert: %s → %s", pos_id, alte_menge, neue_menge)
                     print(f"✓ Menge geändert: {alte_menge} → {neue_menge}")
                     
             except ValueError:
                 print("Fehler: Ungültige Eingabe.")
-                conn.close()
                 return
                 
         elif option == '2':
             bestaetigung = input(f"Position '{prod_name}' ({alte_menge}x) wirklich löschen? (j/n): ").strip().lower()
             if bestaetigung == 'j':
+                c.execute("BEGIN IMMEDIATE")
                 c.execute("DELETE FROM Bestellpositionen WHERE PositionID = ?", (pos_id,))
                 # Bestand zurückbuchen
                 c.execute("UPDATE Lagerbestand SET Menge = Menge + ? WHERE ProduktID = ?", 
                          (alte_menge, prod_id))
-                logging.info(f"Bestellposition {pos_id} gelöscht. Bestand +{alte_menge}")
+                logging.info("Bestellposition %s gelöscht. Bestand +%s", pos_id, alte_menge)
                 print(f"✓ Position gelöscht. Bestand von '{prod_name}' +{alte_menge}")
             else:
                 print("Abgebrochen.")
-                conn.close()
                 return
         else:
             print("Ungültige Auswahl.")
-            conn.close()
             return
         
-        conn.commit()
-        conn.close()
+        if conn.in_transaction:
+            conn.commit()
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in bestellposition_aendern(): {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        logging.error("Fehler in bestellposition_aendern(): %s", e)
         print(f"Fehler: {e}")
 
 def bestellung_status_aendern():
@@ -801,7 +1073,7 @@ def bestellung_status_aendern():
     try:
         bestell_id = int(input("Bestell-ID eingeben: ").strip())
         
-        conn = connect_db()
+        conn = get_conn()
         c = conn.cursor()
         
         # Zeige aktuelle Status
@@ -810,7 +1082,6 @@ def bestellung_status_aendern():
         
         if not result:
             print("Fehler: Bestellung nicht gefunden.")
-            conn.close()
             return
         
         aktueller_status = result[0]
@@ -827,28 +1098,24 @@ def bestellung_status_aendern():
         
         if not neuer_status:
             print("Ungültige Auswahl.")
-            conn.close()
             return
         
         if neuer_status == aktueller_status:
             print("Status ist bereits auf diesem Wert.")
-            conn.close()
             return
         
         c.execute("UPDATE Bestellungen SET Status = ? WHERE BestellID = ?", 
                  (neuer_status, bestell_id))
-        conn.commit()
-        logging.info(f"Bestellung {bestell_id}: Status geändert {aktueller_status} → {neuer_status}")
+        logging.info("Bestellung %s: Status geändert %s → %s", bestell_id, aktueller_status, neuer_status)
         print(f"✓ Bestellstatus geändert: {aktueller_status} → {neuer_status}")
-        conn.close()
         
     except ValueError:
         print("Fehler: Ungültige Eingabe.")
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in bestellung_status_aendern(): {e}")
+        logging.error("Fehler in bestellung_status_aendern(): %s", e)
         print(f"Fehler: {e}")
 
 def rabatt_mwst_aendern():
@@ -857,7 +1124,7 @@ def rabatt_mwst_aendern():
     try:
         bestell_id = int(input("Bestell-ID eingeben: ").strip())
         
-        conn = connect_db()
+        conn = get_conn()
         c = conn.cursor()
         
         # Zeige aktuelle Werte
@@ -866,7 +1133,6 @@ def rabatt_mwst_aendern():
         
         if not result:
             print("Fehler: Bestellung nicht gefunden.")
-            conn.close()
             return
         
         alter_rabatt, alter_mwst = result
@@ -874,36 +1140,16 @@ def rabatt_mwst_aendern():
         print(f"  Rabatt: {alter_rabatt:.2f}%")
         print(f"  MwSt-Satz: {alter_mwst:.2f}%")
         
-        # Neuen Rabatt eingeben
-        try:
-            rabatt_input = input("\nNeuen Rabatt eingeben (%) - (Enter für unverändert): ").strip()
-            if rabatt_input:
-                neuer_rabatt = float(rabatt_input.replace(',', '.'))
-                if neuer_rabatt < 0 or neuer_rabatt > 100:
-                    print("Fehler: Rabatt muss zwischen 0 und 100% liegen.")
-                    conn.close()
-                    return
-            else:
-                neuer_rabatt = alter_rabatt
-        except ValueError:
-            print("Fehler: Ungültiger Rabatt.")
-            conn.close()
+        # Neuen Rabatt eingeben (Enter behält den bisherigen Wert)
+        neuer_rabatt = _read_number("\nNeuen Rabatt eingeben (%) - (Enter für unverändert): ", float,
+                                    max_val=100, leer=alter_rabatt, bezeichnung="Rabatt")
+        if neuer_rabatt is None:
             return
         
         # Neuen MwSt-Satz eingeben
-        try:
-            mwst_input = input("Neuen MwSt-Satz eingeben (%) - (Enter für unverändert): ").strip()
-            if mwst_input:
-                neuer_mwst = float(mwst_input.replace(',', '.'))
-                if neuer_mwst < 0 or neuer_mwst > 100:
-                    print("Fehler: MwSt muss zwischen 0 und 100% liegen.")
-                    conn.close()
-                    return
-            else:
-                neuer_mwst = alter_mwst
-        except ValueError:
-            print("Fehler: Ungültiger MwSt-Satz.")
-            conn.close()
+        neuer_mwst = _read_number("Neuen MwSt-Satz eingeben (%) - (Enter für unverändert): ", float,
+                                  max_val=100, leer=alter_mwst, bezeichnung="MwSt-Satz")
+        if neuer_mwst is None:
             return
         
         # Bestätigung
@@ -916,40 +1162,61 @@ def rabatt_mwst_aendern():
         bestaetigung = input("Bestätigen? (j/n): ").strip().lower()
         if bestaetigung != 'j':
             print("Abgebrochen.")
-            conn.close()
             return
         
         c.execute("UPDATE Bestellungen SET Rabatt = ?, Mwst_Satz = ? WHERE BestellID = ?", 
                  (neuer_rabatt, neuer_mwst, bestell_id))
-        conn.commit()
-        logging.info(f"Bestellung {bestell_id}: Rabatt {alter_rabatt}% → {neuer_rabatt}%, MwSt {alter_mwst}% → {neuer_mwst}%")
+        logging.info("Bestellung %s: Rabatt %s%% → %s%%, MwSt %s%% → %s%%", bestell_id, alter_rabatt, neuer_rabatt, alter_mwst, neuer_mwst)
         print(f"✓ Rabatt und MwSt-Satz aktualisiert.")
-        conn.close()
         
     except ValueError:
         print("Fehler: Ungültige Eingabe.")
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in rabatt_mwst_aendern(): {e}")
+        logging.error("Fehler in rabatt_mwst_aendern(): %s", e)
         print(f"Fehler: {e}")
 
+def _fts_ausdruck(suchbegriff):
+    """Wandelt einen Suchbegriff in einen FTS5-Ausdruck um: jedes Wort als Präfix."""
+    return " ".join('"' + wort.replace('"', '""') + '"*' for wort in suchbegriff.split())
+
+def _stufensuche(c, sql_exakt, sql_like, sql_fts, suchbegriff):
+    """Sucht exakt, per Präfix, im Volltextindex und zuletzt als Teilstring.
+
+    Die erste Stufe mit Treffern gewinnt. Exakt- und Präfixsuche nutzen den
+    NOCASE-Index, die Volltextsuche findet Wortanfänge in beliebiger
+    Reihenfolge ('schm anna'). Nur wenn alles leer bleibt, wird die Tabelle
+    per LIKE '%...%' durchlaufen. Enthält der Suchbegriff '*' oder '%', wird
+    er direkt als LIKE-Muster verwendet ('*' steht für beliebige Zeichen).
+    """
+    if '*' in suchbegriff or '%' in suchbegriff:
+        stufen = [(sql_like, suchbegriff.replace('*', '%'))]
+    else:
+        stufen = [(sql_exakt, suchbegriff),
+                  (sql_like, f"{suchbegriff}%"),
+                  (sql_fts, _fts_ausdruck(suchbegriff)),
+                  (sql_like, f"%{suchbegriff}%")]
+    for sql, wert in stufen:
+        treffer = c.execute(sql, (wert,)).fetchall()
+        if treffer:
+            return treffer
+    return []
+
 def suche_kunde():
     """Sucht einen Kunden nach Name."""
     print("\n--- Kundensuche ---")
     try:
-        suchbegriff = input("Kundennamen eingeben (Teilsuche): ").strip()
+        suchbegriff = input("Kundennamen eingeben (Teilsuche, * als Platzhalter): ").strip()
         if not suchbegriff:
             print("Fehler: Suchbegriff darf nicht leer sein.")
             return
         
-        conn = connect_db()
+        conn = get_ro_conn()
         c = conn.cursor()
-        c.execute("SELECT KundeID, Name, Adresse FROM Kunden WHERE Name LIKE ?", 
-                 (f"%{suchbegriff}%",))
-        kunden = c.fetchall()
-        conn.close()
+        kunden = _stufensuche(c, SQL_KUNDE_SUCHE_EXAKT, SQL_KUNDE_SUCHE_LIKE,
+                              SQL_KUNDE_SUCHE_FTS, suchbegriff)
         
         if not kunden:
             print(f"Keine Kunden gefunden, die '{suchbegriff}' enthalten.")
@@ -959,31 +1226,25 @@ def suche_kunde():
         print_table(["ID", "Name", "Adresse"], kunden)
         
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in suche_kunde(): {e}")
+        logging.error("Fehler in suche_kunde(): %s", e)
         print(f"Fehler: {e}")
 
 def suche_produkt():
     """Sucht ein Produkt nach Name."""
     print("\n--- Produktsuche ---")
     try:
-        suchbegriff = input("Produktnamen eingeben (Teilsuche): ").strip()
+        suchbegriff = input("Produktnamen eingeben (Teilsuche, * als Platzhalter): ").strip()
         if not suchbegriff:
             print("Fehler: Suchbegriff darf nicht leer sein.")
             return
         
-        conn = connect_db()
+        conn = get_ro_conn()
         c = conn.cursor()
-        c.execute("""
-            SELECT P.ProduktID, P.Produktname, P.Preis, COALESCE(L.Menge, 0) as Bestand
-            FROM Produkte P
-            LEFT JOIN Lagerbestand L ON P.ProduktID = L.ProduktID
-            WHERE P.Produktname LIKE ?
-        """, (f"%{suchbegriff}%",))
-        produkte = c.fetchall()
-        conn.close()
+        produkte = _stufensuche(c, SQL_PRODUKT_SUCHE_EXAKT, SQL_PRODUKT_SUCHE_LIKE,
+                                SQL_PRODUKT_SUCHE_FTS, suchbegriff)
         
         if not produkte:
             print(f"Keine Produkte gefunden, die '{suchbegriff}' enthalten.")
@@ -993,10 +1254,10 @@ def suche_produkt():
         print_table(["ID", "Name", "Preis", "Bestand"], produkte)
         
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in suche_produkt(): {e}")
+        logging.error("Fehler in suche_produkt(): %s", e)
         print(f"Fehler: {e}")
 
 def bestellverlauf_kunde():
@@ -1005,45 +1266,33 @@ def bestellverlauf_kunde():
     try:
         kunde_id = int(input("Kunden-ID eingeben: ").strip())
         
-        conn = connect_db()
+        conn = get_ro_conn()
         c = conn.cursor()
         
         # Kunde existieren?
-        c.execute("SELECT Name FROM Kunden WHERE KundeID = ?", (kunde_id,))
+        c.execute(SQL_KUNDE_NAME, (kunde_id,))
         kunde = c.fetchone()
         if not kunde:
             print("Fehler: Kunde nicht gefunden.")
-            conn.close()
             return
         
         print(f"\n--- Bestellverlauf für: {kunde[0]} ---")
         
-        # Alle Bestellungen des Kunden
-        c.execute("""
-            SELECT BestellID, Bestelldatum, Status
-            FROM Bestellungen
-            WHERE KundeID = ?
-            ORDER BY Bestelldatum DESC
-        """, (kunde_id,))
+        # Alle Bestellungen des Kunden mit Warenwert, in einer Abfrage gruppiert
+        c.execute(SQL_BESTELLVERLAUF, (kunde_id,))
         
         bestellungen = c.fetchall()
         if not bestellungen:
             print("Keine Bestellungen vorhanden.")
-            conn.close()
             return
         
-        print_table(["Bestellung-ID", "Datum", "Status"], bestellungen)
+        print_table(["Bestellung-ID", "Datum", "Status", "Summe (€)"], bestellungen)
         
         # Optional: Details einer Bestellung
         try:
             detail_id = int(input("\nBestellung-ID für Details eingeben (oder 0 zum Abbrechen): ").strip())
             if detail_id > 0:
-                c.execute("""
-                    SELECT BP.PositionID, P.Produktname, BP.Menge, P.Preis
-                    FROM Bestellpositionen BP
-                    JOIN Produkte P ON BP.ProduktID = P.ProduktID
-                    WHERE BP.BestellID = ?
-                """, (detail_id,))
+                c.execute(SQL_BESTELLDETAILS, (detail_id,))
                 
                 positionen = c.fetchall()
                 if positionen:
@@ -1054,16 +1303,15 @@ def bestellverlauf_kunde():
         except ValueError:
             pass
         
-        conn.close()
-        logging.info(f"Bestellverlauf angezeigt für Kunde {kunde_id}")
+        logging.info("Bestellverlauf angezeigt für Kunde %s", kunde_id)
         
     except ValueError:
         print("Fehler: Ungültige Eingabe.")
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in bestellverlauf_kunde(): {e}")
+        logging.error("Fehler in bestellverlauf_kunde(): %s", e)
         print(f"Fehler: {e}")
 
 
@@ -1075,41 +1323,32 @@ def preise_bereinigen_menu():
         dry = True if auswahl == 'j' or auswahl == '' else False
         print("Starte Bereinigung (Dry-run=" + str(dry) + ")...")
         try:
-            import importlib
-            cp = importlib.import_module('clean_prices')
-            importlib.reload(cp)
-            changed = cp.clean_prices(dry_run=dry)
+            if clean_prices is None:
+                raise ModuleNotFoundError("clean_prices")
+            changed = clean_prices(dry_run=dry)
             print(f"Bereinigung abgeschlossen. Geänderte Einträge: {changed}")
-            logging.info(f"Preise bereinigt (dry={dry}) - geänderte Einträge: {changed}")
+            logging.info("Preise bereinigt (dry=%s) - geänderte Einträge: %s", dry, changed)
         except ModuleNotFoundError:
             print("Fehler: Modul 'clean_prices.py' nicht gefunden. Stelle sicher, dass die Datei im Projektordner liegt.")
             logging.error("clean_prices.py nicht gefunden")
         except Exception as e:
             print(f"Fehler beim Ausführen der Bereinigung: {e}")
-            logging.error(f"Fehler in preise_bereinigen_menu(): {e}")
+            logging.error("Fehler in preise_bereinigen_menu(): %s", e)
     except Exception as e:
-        logging.error(f"Fehler in preise_bereinigen_menu(): {e}")
+        logging.error("Fehler in preise_bereinigen_menu(): %s", e)
         print(f"Fehler: {e}")
 
 def pruefe_mindestbestaende():
     """Prüft Mindestbestände und meldet Nachbestellungen."""
     print("\n--- Mindestbestand Prüfung ---")
+    global _MINDESTBESTAND_CACHE
     try:
-        conn = connect_db()
-        c = conn.cursor()
-        
-        c.execute("""
-            SELECT L.LagerID, P.ProduktID, P.Produktname, L.Menge, L.Mindestbestand, 
-                   Li.Name as Lieferant, Li.Lieferzeit
-            FROM Lagerbestand L
-            JOIN Produkte P ON L.ProduktID = P.ProduktID
-            JOIN Lieferanten Li ON L.LieferantID = Li.LieferantID
-            WHERE L.Menge <= L.Mindestbestand
-            ORDER BY L.Menge ASC
-        """)
-        
-        nachbestellungen = c.fetchall()
-        conn.close()
+        version = _daten_version()
+        if _MINDESTBESTAND_CACHE is not None and _MINDESTBESTAND_CACHE[0] == version:
+            nachbestellungen = _MINDESTBESTAND_CACHE[1]
+        else:
+            nachbestellungen = get_ro_conn().execute(SQL_MINDESTBESTAND).fetchall()
+            _MINDESTBESTAND_CACHE = (version, nachbestellungen)
         
         if not nachbestellungen:
             print("✓ Alle Bestände sind im grünen Bereich!")
@@ -1118,25 +1357,25 @@ def pruefe_mindestbestaende():
         print(f"\n⚠ {len(nachbestellungen)} Produkt(e) unter Mindestbestand:\n")
         print_table(
             ["ProduktID", "Produkt", "Ist", "Min", "Lieferant", "Lieferzeit"],
-            [(n[1], n[2], n[3], n[4], n[5], f"{n[6]}d") for n in nachbestellungen]
+            [(n[0], n[1], n[2], n[3], n[4], f"{n[5]}d") for n in nachbestellungen]
         )
         
-        print("\n--- Vorgeschlagene Nachbestellungen ---")
-        for nachbestellung in nachbestellungen:
-            lager_id, prod_id, prod_name, ist_menge, min_menge, lief_name, lief_zeit = nachbestellung
-            # Standardmenge: Mindestbestand * 3
-            empf_menge = min_menge * 3
-            differenz = empf_menge - ist_menge
-            
-            print(f"• {prod_name}: {differenz} Stück @ {lief_name} (Lieferzeit: {lief_zeit} Tage)")
+        # Vorschläge gesammelt mit einem write() ausgeben
+        zeilen = ["\n--- Vorgeschlagene Nachbestellungen ---"]
+        zeilen.extend(
+            f"• {prod_name}: {differenz} Stück @ {lief_name} (Lieferzeit: {lief_zeit} Tage)"
+            for prod_id, prod_name, ist_menge, min_menge, lief_name, lief_zeit, differenz in nachbestellungen
+        )
+        sys.stdout.write("\n".join(zeilen) + "\n")
+        sys.stdout.flush()
         
-        logging.info(f"Mindestbestand-Prüfung: {len(nachbestellungen)} Produkte unter Minimum")
+        logging.info("Mindestbestand-Prüfung: %s Produkte unter Minimum", len(nachbestellungen))
         
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {e}")
+        logging.error("Datenbankfehler: %s", e)
         print(f"Datenbankfehler: {e}")
     except Exception as e:
-        logging.error(f"Fehler in pruefe_mindestbestaende(): {e}")
+        logging.error("Fehler in pruefe_mindestbestaende(): %s", e)
         print(f"Fehler: {e}")
 
 def main_menu():
@@ -13,50 +13,63 @@ Nutzung:
 import sqlite3
 import re
 import argparse
-import shutil
 import datetime
 import os
 
 DB = 'bestellverwaltung.db'
 
+# Entfernt alles außer Ziffern, Punkt und Minus (einmal kompiliert)
+_CLEAN_RE = re.compile(r"[^0-9.\-]")
+
 
 def backup_db():
     if not os.path.exists(DB):
         return None
     ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
     name = f"{os.path.splitext(DB)[0]}_CLEANBACKUP_{ts}.db"
-    shutil.copy2(DB, name)
+    # Online-Backup-API statt Dateikopie (erfasst auch noch nicht übernommene WAL-Seiten)
+    src = sqlite3.connect(DB)
+    dst = sqlite3.connect(name)
+    try:
+        src.backup(dst, pages=1000, sleep=0)
+    finally:
+        dst.close()
+        src.close()
     return name
 
 
 def clean_prices(dry_run=False):
     conn = sqlite3.connect(DB)
+    # Gleiche Journal-Einstellungen wie die Hauptanwendung
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA wal_autocheckpoint=1000")
     c = conn.cursor()
 
-    rows = list(c.execute("SELECT ProduktID, Produktname, Preis FROM Produkte"))
     changes = []
 
-    for pid, name, preis in rows:
-        orig = preis
-        parsed = None
-        if isinstance(preis, (int, float)):
+    # Zeilen direkt vom Cursor lesen; bereits numerische und leere Preise filtert
+    # SQLite selbst heraus. Trimmen und Komma-Ersetzung erledigt SQLite ebenfalls
+    # (in C über die ganze Spalte), in Python bleibt nur das eigentliche Parsen.
+    for pid, name, preis, s in c.execute("""
+            SELECT ProduktID, Produktname, Preis, REPLACE(TRIM(Preis), ',', '.')
+            FROM Produkte
+            WHERE typeof(Preis) = 'text' AND TRIM(Preis) <> ''
+            """):
+        # Schneller Weg: schlichte Zahl wie "179.00" oder "-12" ohne Regex
+        ziffern = s[1:] if s.startswith('-') else s
+        if ziffern.isascii() and ziffern.replace('.', '', 1).isdigit():
+            changes.append((pid, name, preis, float(s)))
             continue
-        s = str(preis).strip()
-        if s == '':
-            continue
-        s = s.replace(',', '.')
-        s = re.sub(r"[^0-9.\-]", "", s)
+        s = _CLEAN_RE.sub('', s)
         # if multiple dots, keep last as decimal separator
         if s.count('.') > 1:
             parts = s.split('.')
             s = ''.join(parts[:-1]) + '.' + parts[-1]
         try:
-            val = float(s)
-            parsed = val
-        except Exception:
-            parsed = None
-        if parsed is not None and parsed != orig:
-            changes.append((pid, name, orig, parsed))
+            changes.append((pid, name, preis, float(s)))
+        except ValueError:
+            pass
 
     if not changes:
         print("Keine zu bereinigenden Preise gefunden.")
@@ -76,10 +89,10 @@ def clean_prices(dry_run=False):
     if backup:
         print(f"Datenbank gesichert als: {backup}")
 
-    for pid, name, orig, parsed in changes:
-        c.execute("UPDATE Produkte SET Preis = ? WHERE ProduktID = ?", (parsed, pid))
-
-    conn.commit()
+    # Alle Änderungen in einer Transaktion mit einem vorbereiteten Statement
+    with conn:
+        c.executemany("UPDATE Produkte SET Preis = ? WHERE ProduktID = ?",
+                      [(parsed, pid) for pid, name, orig, parsed in changes])
     conn.close()
     print(f"{len(changes)} Preise bereinigt.")
     return len(changes)
@@ -2,12 +2,12 @@
 daily_backup.py
 
 Einfaches Backup-Skript für `bestellverwaltung.db`.
-- Erstellt ein Backup mit Zeitstempel im selben Ordner.
+- Erstellt ein kompaktes Backup (VACUUM INTO) mit Zeitstempel im selben Ordner.
 - Optional: behält nur die letzten N Backups (Retention).
 
 Usage: python daily_backup.py [--keep N]
 """
-import shutil
+import sqlite3
 import datetime
 import argparse
 import os
@@ -22,7 +22,20 @@ def backup_db(keep=DEFAULT_KEEP):
         return 1
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
     backup_name = f"bestellverwaltung_BACKUP_{timestamp}.db"
-    shutil.copy2(DB, backup_name)
+    # VACUUM INTO schreibt nur belegte Seiten (kompakte, konsistente Kopie).
+    # Ältere SQLite-Versionen (< 3.27) kennen es nicht, dann Online-Backup-API.
+    src = sqlite3.connect(DB)
+    try:
+        if sqlite3.sqlite_version_info >= (3, 27, 0):
+            src.execute("VACUUM INTO ?", (backup_name,))
+        else:
+            dst = sqlite3.connect(backup_name)
+            try:
+                src.backup(dst, pages=1000, sleep=0)
+            finally:
+                dst.close()
+    finally:
+        src.close()
     print('Backup erstellt:', backup_name)
 
     # Retention: alte Backups löschen
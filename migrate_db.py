@@ -2,17 +2,35 @@ import sqlite3
 import time
 
 DB='bestellverwaltung.db'
+
+
+def mit_backoff(c, sql):
+    """Führt sql auf dem Cursor c aus; bei gesperrter DB erneut mit wachsender Wartezeit (0.1, 0.2, 0.4 ... s).
+
+    Gibt False zurück, wenn die DB nach allen Versuchen noch gesperrt ist.
+    """
+    wartezeit=0.1
+    for attempt in range(8):
+        try:
+            c.execute(sql)
+            return True
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            print('DB gesperrt, Versuch', attempt, '- warte', wartezeit, 's')
+            time.sleep(wartezeit)
+            wartezeit*=2
+    return False
+
 print('Starte Migration: Bitte stelle sicher, dass kein anderes Programm die DB geöffnet hat.')
-for attempt in range(6):
-    try:
-        conn=sqlite3.connect(DB, timeout=10)
-        c=conn.cursor()
-        break
-    except Exception as e:
-        print('connect attempt', attempt, 'failed:', e)
-        time.sleep(1)
-else:
-    raise SystemExit('Konnte keine Verbindung zur DB herstellen.')
+# Verbinden blockiert nicht; gesperrt sein können nur Schreibsperre, Commit und
+# Wechsel des Journal-Modus. Diese werden mit mit_backoff() wiederholt.
+# timeout=0, damit SQLite nicht selbst schon 10 s pro Versuch wartet.
+conn=sqlite3.connect(DB, timeout=0)
+c=conn.cursor()
+# ALTERs und Defaults in einer Transaktion (ein Commit statt mehrerer Autocommits)
+if not mit_backoff(c, "BEGIN IMMEDIATE"):
+    raise SystemExit('Konnte keine Schreibsperre auf die DB erhalten.')
 
 cols=[r[1] for r in c.execute("PRAGMA table_info(Bestellungen)")]
 print('Aktuelle Spalten in Bestellungen:', cols)
@@ -39,21 +57,36 @@ if 'Mwst_Satz' not in cols:
     except Exception as e:
         print('Fehler beim Hinzufügen von Mwst_Satz:', e)
 
-conn.commit()
 print('Anzahl Änderungen:', changes)
 print('Spalten nach Migration:')
 for r in c.execute("PRAGMA table_info(Bestellungen)"):
     print(r)
 
-# Defaults setzen
+# Defaults setzen (ein Durchlauf über Bestellungen für alle drei Spalten)
 try:
-    c.execute("UPDATE Bestellungen SET Rabatt = 0.0 WHERE Rabatt IS NULL")
-    c.execute("UPDATE Bestellungen SET Mwst_Satz = 19.0 WHERE Mwst_Satz IS NULL")
-    c.execute("UPDATE Bestellungen SET Status = 'offen' WHERE Status IS NULL")
-    conn.commit()
+    c.execute("""
+        UPDATE Bestellungen
+        SET Rabatt = COALESCE(Rabatt, 0.0),
+            Mwst_Satz = COALESCE(Mwst_Satz, 19.0),
+            Status = COALESCE(Status, 'offen')
+        WHERE Rabatt IS NULL OR Mwst_Satz IS NULL OR Status IS NULL
+    """)
     print('Defaults gesetzt')
 except Exception as e:
     print('Fehler beim Setzen der Defaults:', e)
 
+# Im Rollback-Journal-Modus braucht auch der Commit eine exklusive Sperre
+if not mit_backoff(c, "COMMIT"):
+    conn.rollback()
+    raise SystemExit('Konnte die Migration nicht abschließen (DB gesperrt), Änderungen verworfen.')
+
+# WAL wie in der Hauptanwendung. Der Wechsel braucht eine exklusive Sperre und ist
+# innerhalb einer Transaktion nicht möglich, daher erst nach dem Commit.
+# synchronous bleibt beim sicheren Standard (FULL): im Rollback-Journal-Modus
+# riskiert NORMAL bei Stromausfall eine beschädigte DB, und die Migration selbst
+# läuft noch in diesem Modus. Die Anwendung setzt NORMAL erst unter WAL.
+if not mit_backoff(c, "PRAGMA journal_mode=WAL"):
+    print('Hinweis: Journal-Modus nicht umgestellt (DB gesperrt); die Anwendung stellt beim Start auf WAL um.')
+
 conn.close()
 print('Migration abgeschlossen.')